@@ -4,123 +4,310 @@ import sqlite3
 import argparse
 import csv
 import os
+import mmap
+import functools
+import hashlib
+import marshal
+import itertools
+import tempfile
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-def read_varint(data, offset):
-    """Reads a varint from data starting at offset."""
+# Pages are parsed and streamed to the output in shards of this many pages;
+# it is also the smallest amount of work worth handing to a worker process
+PAGES_PER_SHARD = 256
+
+# Compiled big-endian formats shared by every decoder in this module
+_U16 = struct.Struct('>H')
+_U32 = struct.Struct('>I')
+_U64 = struct.Struct('>Q')
+_S8 = struct.Struct('>b')
+_S16 = struct.Struct('>h')
+_S32 = struct.Struct('>i')
+_S64 = struct.Struct('>q')
+_F64 = struct.Struct('>d')
+
+# Threads writing extracted images, and how many rows or writes may be held back at once
+IMAGE_WRITERS = 16
+IMAGE_WRITE_QUEUE = 1024
+
+# Rows per pickled batch when spooling CSV output
+SPOOL_BATCH_SIZE = 1000
+
+def _gather_7bit_groups(word):
+    """Packs the low seven bits of each byte of a 64-bit word into a 56-bit integer."""
+    word &= 0x7F7F7F7F7F7F7F7F
+    word = (word & 0x007F007F007F007F) | ((word & 0x7F007F007F007F00) >> 1)
+    word = (word & 0x00003FFF00003FFF) | ((word & 0x3FFF00003FFF0000) >> 2)
+    return (word & 0x000000000FFFFFFF) | ((word & 0x0FFFFFFF00000000) >> 4)
+
+def read_varint(data, offset, data_len):
+    """
+    Reads a varint from data starting at offset. Bytes at or beyond data_len,
+    which callers compute once and pass in, are treated as out of bounds.
+    """
+    if offset >= data_len:
+        raise IndexError("Offset out of bounds while reading varint.")
+    # Header lengths and most serial types fit in one or two bytes.
+    b0 = data[offset]
+    if b0 < 0x80:
+        return b0, 1
+    if offset + 1 < data_len:
+        b1 = data[offset + 1]
+        if b1 < 0x80:
+            return ((b0 & 0x7F) << 7) | b1, 2
+    if offset + 9 <= data_len:
+        # Load eight bytes at once; the first byte with a clear high bit ends the varint.
+        word = _U64.unpack_from(data, offset)[0]
+        stops = ~word & 0x8080808080808080
+        if stops:
+            length = (64 - stops.bit_length()) // 8 + 1
+            return _gather_7bit_groups(word >> (64 - 8 * length)), length
+        # No terminator in eight bytes: the ninth byte contributes all eight bits.
+        return (_gather_7bit_groups(word) << 8) | data[offset + 8], 9
+    # Too close to the end of data for a word load; read byte by byte.
     value = 0
     for i in range(9):
-        if offset + i >= len(data):
+        if offset + i >= data_len:
             raise IndexError("Offset out of bounds while reading varint.")
         byte = data[offset + i]
+        if i == 8:
+            return (value << 8) | byte, 9
         if byte < 0x80:
             value = (value << 7) | byte
             return value, i + 1
         else:
             value = (value << 7) | (byte & 0x7F)
-    return value, 9
+
+# Fixed-width serial types that map directly onto a struct format.
+_FIXED = {
+    1: (_S8, 1),
+    2: (_S16, 2),
+    4: (_S32, 4),
+    6: (_S64, 8),
+    7: (_F64, 8),
+}
 
 def parse_serial_type(data, offset, serial_type):
     """Parses a value from data starting at offset based on the serial type."""
-    if serial_type >= 12 and serial_type % 2 == 0:
-        # Blob
-        length = (serial_type - 12) // 2
-        value = data[offset:offset+length]
-        return value, length
-    elif serial_type >= 13 and serial_type % 2 == 1:
-        # Text
-        length = (serial_type - 13) // 2
-        value = data[offset:offset+length].decode('utf-8', errors='replace')
+    fixed = _FIXED.get(serial_type)
+    if fixed is not None:
+        fmt, length = fixed
+        return fmt.unpack_from(data, offset)[0], length
+    if serial_type >= 12:
+        if serial_type % 2 == 0:
+            # Blob
+            length = (serial_type - 12) // 2
+            value = bytes(data[offset:offset+length])
+        else:
+            # Text
+            length = (serial_type - 13) // 2
+            value = str(data[offset:offset+length], 'utf-8', errors='replace')
         return value, length
-    elif serial_type == 0:
-        return None, 0
-    elif serial_type == 1:
-        value = struct.unpack('>b', data[offset:offset+1])[0]
-        return value, 1
-    elif serial_type == 2:
-        value = struct.unpack('>h', data[offset:offset+2])[0]
-        return value, 2
     elif serial_type == 3:
-        value = int.from_bytes(data[offset:offset+3], 'big', signed=True)
+        # 24-bit and 48-bit integers have no struct format; assemble and sign-extend
+        value = (data[offset] << 16) | (data[offset+1] << 8) | data[offset+2]
+        if value & 0x800000:
+            value -= 0x1000000
         return value, 3
-    elif serial_type == 4:
-        value = struct.unpack('>i', data[offset:offset+4])[0]
-        return value, 4
     elif serial_type == 5:
-        value = int.from_bytes(data[offset:offset+6], 'big', signed=True)
+        value = ((data[offset] << 40) | (data[offset+1] << 32) | (data[offset+2] << 24)
+                 | (data[offset+3] << 16) | (data[offset+4] << 8) | data[offset+5])
+        if value & 0x800000000000:
+            value -= 0x1000000000000
         return value, 6
-    elif serial_type == 6:
-        value = struct.unpack('>q', data[offset:offset+8])[0]
-        return value, 8
-    elif serial_type == 7:
-        value = struct.unpack('>d', data[offset:offset+8])[0]
-        return value, 8
     elif serial_type == 8:
         return 0, 0
     elif serial_type == 9:
         return 1, 0
     else:
-        return None, 0  # For serial types 10 and 11
+        return None, 0  # For serial types 0, 10 and 11
 
 def parse_record(data, offset, payload_length):
     """Parses a record from data starting at offset with given payload_length."""
     try:
         header_offset = offset
-        header_length, n = read_varint(data, header_offset)
+        data_len = len(data)
+        header_length, n = read_varint(data, header_offset, data_len)
         header_offset += n
         if header_length > payload_length:
             return None
+        # Bind the hot callables to locals; this loop runs once per field.
+        read = read_varint
+        parse = parse_serial_type
         serial_types = []
-        bytes_read = n
-        while bytes_read < header_length:
-            serial_type, n = read_varint(data, header_offset)
-            serial_types.append(serial_type)
+        add_serial_type = serial_types.append
+        header_end = offset + header_length
+        while header_offset < header_end:
+            serial_type, n = read(data, header_offset, data_len)
+            add_serial_type(serial_type)
             header_offset += n
-            bytes_read += n
         values = []
-        value_offset = offset + header_length
+        add_value = values.append
+        value_offset = header_end
         for serial_type in serial_types:
-            value, length = parse_serial_type(data, value_offset, serial_type)
-            values.append(value)
+            value, length = parse(data, value_offset, serial_type)
+            add_value(value)
             value_offset += length
         return values
     except Exception:
         return None
 
-def parse_page(data, page_number, page_size, records):
-    """Parses a page and appends records to the records list."""
-    page_offset = page_number * page_size
-    page_data = data[page_offset:page_offset+page_size]
-    if len(page_data) == 0:
+def append_record(columns, record):
+    """
+    Appends record to columns, which holds one list per field position.
+    Short records and existing rows are padded with None so that every
+    column keeps the same length.
+    """
+    num_rows = len(columns[0]) if columns else 0
+    for _ in range(len(columns), len(record)):
+        columns.append([None] * num_rows)
+    for column, value in zip(columns, record):
+        column.append(value)
+    for column in columns[len(record):]:
+        column.append(None)
+
+@functools.lru_cache(maxsize=None)
+def cell_pointer_struct(num_cells):
+    """Returns a compiled Struct for a cell pointer array of num_cells entries."""
+    return struct.Struct(f'>{num_cells}H')
+
+def parse_page(data, page_offset, page_size):
+    """Parses the page starting at page_offset and yields (rowid, record) pairs."""
+    data_len = len(data)
+    if page_offset < 0 or page_offset >= data_len:
         return
-    page_type = page_data[0]
+    # All offsets below are absolute into data; page_end bounds reads to this page.
+    page_end = min(page_offset + page_size, data_len)
+    page_type = data[page_offset]
     if page_type not in [0x0D, 0x05]:
         return
-    num_cells = struct.unpack('>H', page_data[3:5])[0]
-    cell_pointers = []
     header_size = 8 if page_type == 0x0D else 12
-    for i in range(num_cells):
-        ptr_offset = header_size + i*2
-        if ptr_offset + 2 > len(page_data):
-            continue
-        ptr = struct.unpack('>H', page_data[ptr_offset:ptr_offset + 2])[0]
-        cell_pointers.append(ptr)
+    pointers_offset = page_offset + header_size
+    if pointers_offset > page_end:
+        return
+    num_cells = _U16.unpack_from(data, page_offset + 3)[0]
+    # Read the whole cell pointer array in one call, dropping any pointers
+    # that would run past the end of the page
+    num_cells = max(0, min(num_cells, (page_end - pointers_offset) // 2))
+    cell_pointers = cell_pointer_struct(num_cells).unpack_from(data, pointers_offset)
+    read = read_varint
+    is_interior = page_type == 0x05
     for cell_pointer in cell_pointers:
-        cell_offset = cell_pointer
+        cell_offset = page_offset + cell_pointer
+        if cell_offset >= page_end:
+            continue
         try:
-            payload_length, n = read_varint(page_data, cell_offset)
+            payload_length, n = read(data, cell_offset, page_end)
             cell_offset += n
-            if page_type == 0x05:
-                left_child_page, n = read_varint(page_data, cell_offset)
+            if is_interior:
+                left_child_page, n = read(data, cell_offset, page_end)
                 cell_offset += n
-            rowid, n = read_varint(page_data, cell_offset)
+            rowid, n = read(data, cell_offset, page_end)
             cell_offset += n
-            payload = page_data[cell_offset:cell_offset+payload_length]
+            payload = data[cell_offset:min(cell_offset+payload_length, page_end)]
             record = parse_record(payload, 0, payload_length)
             if record:
-                records.append(record)
+                yield rowid, record
         except Exception:
             continue  # Skip malformed cells
 
+def map_file(filename, prefetch=False):
+    """
+    Maps filename read-only and returns a memoryview over its contents.
+    With prefetch, the kernel is asked to start reading the whole file into
+    the page cache in the background, where worker processes share it.
+    """
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''  # mmap refuses to map an empty file
+        if prefetch and hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+def parse_pages(source_filename, page_size, page_numbers):
+    """
+    Parses the given pages of source_filename and returns the rowids of the
+    recovered records along with the records as columns.
+    Runs in worker processes, each of which maps the file itself so the pages
+    are shared through the OS page cache rather than copied to every worker.
+    """
+    data = map_file(source_filename)
+    rowids = []
+    columns = []
+    for page_number in page_numbers:
+        for rowid, record in parse_page(data, page_number * page_size, page_size):
+            rowids.append(rowid)
+            append_record(columns, record)
+    return rowids, columns
+
+def iter_shards(source_filename, page_size, page_numbers, jobs):
+    """
+    Yields the parse_pages result for each shard of page_numbers, in page order.
+    With more than one job the shards are fanned out to worker processes, with
+    only a few in flight at a time so that results never pile up in memory.
+    """
+    shards = [page_numbers[i:i+PAGES_PER_SHARD] for i in range(0, len(page_numbers), PAGES_PER_SHARD)]
+    if jobs <= 1:
+        for shard in shards:
+            yield parse_pages(source_filename, page_size, shard)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for shard in shards:
+            pending.append(executor.submit(parse_pages, source_filename, page_size, shard))
+            if len(pending) >= jobs * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def iter_rows(shards):
+    """
+    Yields (rowid, row) pairs for the rows held in each shard's columns. Rows
+    are padded to the widest record seen so far, so row widths never decrease.
+    """
+    num_fields = 0
+    for rowids, columns in shards:
+        if not columns:
+            continue
+        num_fields = max(num_fields, len(columns))
+        num_rows = len(columns[0])
+        columns.extend([None] * num_rows for _ in range(len(columns), num_fields))
+        yield from zip(rowids, zip(*columns))
+
+def record_key(rowid, row):
+    """
+    Returns a 128-bit digest identifying the record with this rowid and the
+    contents of row, ignoring its padding. The values are serialized with
+    marshal, which writes a type code and a length prefix ahead of each value
+    and copies BLOB and TEXT payloads as they are, so values that compare or
+    hash equal across types (1 and 1.0, TEXT and BLOB with the same bytes)
+    stay distinct. Format version 0 has no object references or interning
+    flags, so equal records always serialize to the same bytes.
+    """
+    num_fields = len(row)
+    while num_fields and row[num_fields - 1] is None:
+        num_fields -= 1
+    encoded = marshal.dumps((rowid, row[:num_fields]), 0)
+    return hashlib.blake2b(encoded, digest_size=16).digest()
+
+def drop_duplicates(records):
+    """
+    Takes (rowid, row) pairs and yields each distinct row once. The same
+    record is often recovered from both the live B-tree and stale copies on
+    freelist pages. Records are keyed on their rowid as well as their values,
+    so separate rows that merely hold the same values are all kept. Only a
+    digest of each record is kept, so memory stays small.
+    """
+    seen = set()
+    for rowid, row in records:
+        key = record_key(rowid, row)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield row
+
 def get_freelist_pages(data, page_size, freelist_trunk_page, total_freelist_pages):
     """Traverses the freelist and collects all freelist pages."""
     freelist_pages = []
@@ -138,42 +325,134 @@ def get_freelist_pages(data, page_size, freelist_trunk_page, total_freelist_page
             if len(page_data) < 8:
                 print(f"Insufficient data to read freelist trunk page at page {next_trunk_page}")
                 break
-            next_trunk_page = struct.unpack('>I', page_data[0:4])[0]
-            n = struct.unpack('>I', page_data[4:8])[0]
+            next_trunk_page = _U32.unpack_from(page_data, 0)[0]
+            n = _U32.unpack_from(page_data, 4)[0]
             for i in range(n):
                 offset = 8 + i*4
                 if offset + 4 > len(page_data):
                     print(f"Insufficient data to read freelist leaf page at index {i} on page {next_trunk_page}")
                     break
-                page_num = struct.unpack('>I', page_data[offset:offset + 4])[0]
+                page_num = _U32.unpack_from(page_data, offset)[0]
                 freelist_pages.append(page_num - 1)
                 pages_collected += 1
     except Exception as e:
         print(f"Error reading freelist pages: {e}")
     return freelist_pages
 
+# Common image file signatures, all anchored at offset 0
+IMAGE_SIGNATURES = {
+    b'\xFF\xD8\xFF': 'jpg',  # JPEG
+    b'\x89PNG\r\n\x1A\n': 'png',  # PNG
+    b'GIF87a': 'gif',  # GIF87a
+    b'GIF89a': 'gif',  # GIF89a
+    b'BM': 'bmp',  # BMP
+    b'II*\x00': 'tif',  # TIFF little-endian
+    b'MM\x00*': 'tif',  # TIFF big-endian
+    b'\x00\x00\x01\x00': 'ico',  # ICO
+}
+
+# Signatures grouped by their first byte, so a blob is only compared
+# against the handful that could possibly match
+_SIGS_BY_FIRST_BYTE = {}
+for _sig, _fmt in IMAGE_SIGNATURES.items():
+    _SIGS_BY_FIRST_BYTE.setdefault(_sig[0], []).append((_sig[1:], _fmt))
+del _sig, _fmt
+
 def identify_image(blob_data):
     """
     Identifies if the BLOB data is an image by checking common image file signatures.
     Returns the image format if recognized, otherwise returns None.
     """
-    signatures = {
-        b'\xFF\xD8\xFF': 'jpg',  # JPEG
-        b'\x89PNG\r\n\x1A\n': 'png',  # PNG
-        b'GIF87a': 'gif',  # GIF87a
-        b'GIF89a': 'gif',  # GIF89a
-        b'BM': 'bmp',  # BMP
-        b'II*\x00': 'tif',  # TIFF little-endian
-        b'MM\x00*': 'tif',  # TIFF big-endian
-        b'\x00\x00\x01\x00': 'ico',  # ICO
-    }
-    max_sig_len = max(len(sig) for sig in signatures)
-    blob_start = blob_data[:max_sig_len]
-    for sig, fmt in signatures.items():
-        if blob_start.startswith(sig):
+    if len(blob_data) < 2:
+        return None
+    candidates = _SIGS_BY_FIRST_BYTE.get(blob_data[0])
+    if not candidates:
+        return None
+    for rest, fmt in candidates:
+        if blob_data[1:1+len(rest)] == rest:
             return fmt
     return None
 
+def write_image(image_path, blob_data):
+    """
+    Writes blob_data to image_path with a bare open/write/close, bypassing
+    buffered IO. A partially written file is removed if the write fails.
+    """
+    fd = os.open(image_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        view = memoryview(blob_data)
+        while view:
+            view = view[os.write(fd, view):]
+    except BaseException:
+        os.close(fd)
+        os.unlink(image_path)
+        raise
+    os.close(fd)
+
+def save_row_images(rows, image_dir):
+    """
+    Saves image BLOBs found in rows to image_dir, replacing each with the
+    filename it was saved under. Yields the rows as lists, in order.
+    The files are written to temporary names by a thread pool so that file
+    creation overlaps with parsing. A row is only yielded once its writes
+    have finished; a BLOB whose write failed is left in place.
+    """
+    image_counter = 1
+    temp_counter = 0
+    pending = deque()  # (row, writes) awaiting their image writes, in row order
+    queued = 0
+    with ThreadPoolExecutor(max_workers=IMAGE_WRITERS) as executor:
+        for row in rows:
+            row = list(row)
+            writes = []
+            for idx, value in enumerate(row):
+                if isinstance(value, bytes):
+                    fmt = identify_image(value)
+                    if fmt:
+                        temp_counter += 1
+                        temp_path = os.path.join(image_dir, f'.image_{temp_counter}.part')
+                        writes.append((idx, fmt, temp_path, executor.submit(write_image, temp_path, value)))
+            pending.append((row, writes))
+            queued += len(writes)
+            # Release finished rows, and bound the rows and blobs held back
+            while pending and (len(pending) > IMAGE_WRITE_QUEUE or queued > IMAGE_WRITE_QUEUE
+                               or all(write[3].done() for write in pending[0][1])):
+                row, writes = pending.popleft()
+                queued -= len(writes)
+                image_counter = finish_image_writes(row, writes, image_dir, image_counter)
+                yield row
+        while pending:
+            row, writes = pending.popleft()
+            image_counter = finish_image_writes(row, writes, image_dir, image_counter)
+            yield row
+
+def finish_image_writes(row, writes, image_dir, image_counter):
+    """
+    Waits for the image writes queued for row. Each saved image is renamed to
+    the next image_N filename, which replaces its BLOB in row; failures are
+    reported and keep the BLOB. Returns the next unused image number.
+    """
+    for idx, fmt, temp_path, future in writes:
+        e = future.exception()
+        if e is None:
+            image_filename = f'image_{image_counter}.{fmt}'
+            try:
+                os.replace(temp_path, os.path.join(image_dir, image_filename))
+            except OSError as e:
+                print(f"Failed to save image: {e}")
+                continue
+            row[idx] = image_filename  # Replace BLOB data with filename
+            image_counter += 1
+        else:
+            print(f"Failed to save image: {e}")
+    return image_counter
+
+@functools.lru_cache(maxsize=None)
+def insert_statement(num_fields):
+    """Returns the INSERT statement for a recovered_data table of num_fields columns."""
+    placeholders = ', '.join(['?'] * num_fields)
+    return f'INSERT INTO recovered_data VALUES ({placeholders})'
+
 def main():
     parser = argparse.ArgumentParser(description='SQLite Forensic Data Recovery Tool')
     parser.add_argument('-i', '--input', required=True, help='Input SQLite database file')
@@ -181,6 +460,8 @@ def main():
     parser.add_argument('-f', '--format', choices=['sqlite', 'csv'], default='sqlite', help='Output format: sqlite (default) or csv')
     parser.add_argument('-e', '--extract-images', action='store_true', help='Extract images from BLOB fields')
     parser.add_argument('-d', '--image-dir', default='images', help='Directory to save extracted images')
+    parser.add_argument('-k', '--keep-duplicates', action='store_true', help='Keep records recovered more than once instead of writing each distinct record once')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='Number of worker processes used to parse pages (default: number of CPUs)')
     args = parser.parse_args()
 
     source_filename = args.input
@@ -190,8 +471,9 @@ def main():
     image_dir = args.image_dir
 
     try:
-        with open(source_filename, 'rb') as f:
-            data = f.read()
+        # Map the file instead of reading it so that page slices are zero-copy
+        # views and large images are paged in on demand.
+        data = map_file(source_filename, prefetch=True)
     except Exception as e:
         print(f"Error reading input file: {e}")
         sys.exit(1)
@@ -205,121 +487,102 @@ def main():
     if file_header[:16] != b'SQLite format 3\x00':
         print("Not a valid SQLite 3 database file.")
         sys.exit(1)
-    page_size = struct.unpack('>H', file_header[16:18])[0]
+    page_size = _U16.unpack_from(file_header, 16)[0]
     if page_size == 1:
         page_size = 65536
     # Get freelist information
-    freelist_trunk_page = struct.unpack('>I', file_header[32:36])[0]
-    total_freelist_pages = struct.unpack('>I', file_header[36:40])[0]
+    freelist_trunk_page = _U32.unpack_from(file_header, 32)[0]
+    total_freelist_pages = _U32.unpack_from(file_header, 36)[0]
     # Collect freelist pages
     freelist_pages = []
     if freelist_trunk_page != 0:
         freelist_pages = get_freelist_pages(data, page_size, freelist_trunk_page, total_freelist_pages)
 
-    # Prepare to collect records
-    records = []
-    max_fields = 0
-    # Parse all pages
+    # Parse all pages, then the freelist pages separately if needed
     num_pages = len(data) // page_size
-    for page_number in range(num_pages):
-        parse_page(data, page_number, page_size, records)
-    # Parse freelist pages separately if needed
-    if freelist_pages:
-        for page_number in freelist_pages:
-            parse_page(data, page_number, page_size, records)
-    else:
+    page_numbers = list(range(num_pages)) + freelist_pages
+    if not freelist_pages:
         print("No freelist pages found or an error occurred while reading freelist pages.")
-
-    if not records:
+    jobs = min(args.jobs, len(page_numbers) // PAGES_PER_SHARD)
+    records = iter_rows(iter_shards(source_filename, page_size, page_numbers, jobs))
+    first_record = next(records, None)
+    if first_record is None:
         print("No records recovered.")
         sys.exit(1)
+    records = itertools.chain([first_record], records)
+    if args.keep_duplicates:
+        rows = (row for rowid, row in records)
+    else:
+        rows = drop_duplicates(records)
 
-    # Determine the maximum number of fields
-    for record in records:
-        if len(record) > max_fields:
-            max_fields = len(record)
     # Create image directory if extracting images
     if extract_images:
         if not os.path.exists(image_dir):
             os.makedirs(image_dir)
-        image_counter = 1
     # Output the data
     if output_format == 'sqlite':
         # Create new database and create a generic table
         conn = sqlite3.connect(output_filename)
         cursor = conn.cursor()
-        # Create generic table
-        field_names = ', '.join([f'field{i+1}' for i in range(max_fields)])
-        create_table_sql = f'CREATE TABLE recovered_data ({field_names})'
-        cursor.execute(create_table_sql)
-        # Insert records
-        for record in records:
-            num_fields = len(record)
-            if num_fields < max_fields:
-                record.extend([None] * (max_fields - num_fields))
-            if extract_images:
-                # Process each field to extract images
-                for idx, value in enumerate(record):
-                    if isinstance(value, bytes):
-                        fmt = identify_image(value)
-                        if fmt:
-                            image_filename = f'image_{image_counter}.{fmt}'
-                            image_path = os.path.join(image_dir, image_filename)
-                            try:
-                                with open(image_path, 'wb') as img_file:
-                                    img_file.write(value)
-                                record[idx] = image_filename  # Replace BLOB data with filename
-                                image_counter += 1
-                            except Exception as e:
-                                print(f"Failed to save image: {e}")
-                        else:
-                            record[idx] = value.hex()
-            placeholders = ', '.join(['?'] * max_fields)
-            insert_sql = f'INSERT INTO recovered_data VALUES ({placeholders})'
-            cursor.execute(insert_sql, record)
+        # The output is a fresh scratch database, so trade durability for load speed
+        cursor.executescript(
+            'PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF; '
+            'PRAGMA cache_size=-65536; PRAGMA temp_store=MEMORY;'
+        )
+        # Create a generic table, widening it whenever a wider record turns up.
+        # Row widths never decrease, so each width forms one consecutive run.
+        num_fields = 0
+        if extract_images:
+            rows = save_row_images(rows, image_dir)
+        conn.execute('BEGIN')
+        for width, width_rows in itertools.groupby(rows, key=len):
+            if num_fields == 0:
+                field_names = ', '.join([f'field{i+1}' for i in range(width)])
+                cursor.execute(f'CREATE TABLE recovered_data ({field_names})')
+            else:
+                for i in range(num_fields, width):
+                    cursor.execute(f'ALTER TABLE recovered_data ADD COLUMN field{i+1}')
+            num_fields = width
+            cursor.executemany(insert_statement(num_fields), width_rows)
         conn.commit()
         conn.close()
         print(f"Data recovery complete. New SQLite database created at {output_filename}")
         if extract_images:
             print(f"Extracted images saved in '{image_dir}' directory.")
     elif output_format == 'csv':
-        if extract_images and not os.path.exists(image_dir):
-            os.makedirs(image_dir)
-            image_counter = 1
-        with open(output_filename, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            # Write header
-            header = [f'field{i+1}' for i in range(max_fields)]
-            writer.writerow(header)
-            # Write records
-            for record in records:
-                num_fields = len(record)
-                if num_fields < max_fields:
-                    record.extend([None] * (max_fields - num_fields))
-                # Convert bytes to hex string for BLOB data
-                formatted_record = []
-                for value in record:
-                    if isinstance(value, bytes):
-                        if extract_images:
-                            fmt = identify_image(value)
-                            if fmt:
-                                image_filename = f'image_{image_counter}.{fmt}'
-                                image_path = os.path.join(image_dir, image_filename)
-                                try:
-                                    with open(image_path, 'wb') as img_file:
-                                        img_file.write(value)
-                                    formatted_record.append(image_filename)
-                                    image_counter += 1
-                                except Exception as e:
-                                    print(f"Failed to save image: {e}")
-                                    formatted_record.append(value.hex())
-                            else:
-                                formatted_record.append(value.hex())
-                        else:
-                            formatted_record.append(value.hex())
-                    else:
-                        formatted_record.append(value)
-                writer.writerow(formatted_record)
+        # The header needs the final width, so rows are pickled to a temporary
+        # spool in batches while the widest record is tracked, then written
+        # out once, padded, behind the header.
+        with tempfile.TemporaryFile() as spool:
+            num_fields = 0
+            batch = []
+            # Format records, converting bytes to hex strings for BLOB data
+            if extract_images:
+                rows = save_row_images(rows, image_dir)
+            for row in rows:
+                num_fields = len(row)
+                batch.append([value.hex() if isinstance(value, bytes) else value for value in row])
+                if len(batch) >= SPOOL_BATCH_SIZE:
+                    pickle.dump(batch, spool, pickle.HIGHEST_PROTOCOL)
+                    batch = []
+            if batch:
+                pickle.dump(batch, spool, pickle.HIGHEST_PROTOCOL)
+            spool.seek(0)
+            with open(output_filename, 'w', newline='', encoding='utf-8') as csvfile:
+                writer = csv.writer(csvfile)
+                # Write header
+                header = [f'field{i+1}' for i in range(num_fields)]
+                writer.writerow(header)
+                # Write records
+                while True:
+                    try:
+                        batch = pickle.load(spool)
+                    except EOFError:
+                        break
+                    for row in batch:
+                        if len(row) < num_fields:
+                            row.extend([None] * (num_fields - len(row)))
+                    writer.writerows(batch)
         print(f"Data recovery complete. CSV file created at {output_filename}")
         if extract_images:
             print(f"Extracted images saved in '{image_dir}' directory.")
@@ -0,0 +1,202 @@
+import csv
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import extract
+
+# Distinct rows whose built-in hashes collide: hash(-1) == hash(-2),
+# hash(1) == hash(1.0) and hash(2**61 - 1) == hash(0)
+COLLIDING_ROWS = [(5, -1), (5, -2), (7, 1), (7, 1.0), (9, 2**61 - 1), (9, 0)]
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'extract.py')
+
+
+def encode_varint(value):
+    """Encodes value as an SQLite varint, the 9th byte carrying all 8 bits."""
+    if value > 0x00FFFFFFFFFFFFFF:
+        out = [value & 0xFF]
+        value >>= 8
+        for _ in range(8):
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        return bytes(reversed(out))
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(out))
+
+
+# Values whose encodings are 1 to 9 bytes long
+VARINTS = [0, 0x7F, 0x80, 0x3FFF, 0x4000, 0x1FFFFF, 0x200000, 0xFFFFFFF,
+           0x10000000, 0x7FFFFFFFF, 0x800000000, 0x3FFFFFFFFFF, 0x40000000000,
+           0x1FFFFFFFFFFFF, 0x2000000000000, 0xFFFFFFFFFFFFFF, 0x100000000000000,
+           0xFFFFFFFFFFFFFFFF]
+
+
+class ReadVarintTest(unittest.TestCase):
+
+    def check(self, padding):
+        lengths = set()
+        for value in VARINTS:
+            encoded = encode_varint(value)
+            lengths.add(len(encoded))
+            data = b'\x01' + encoded + padding
+            with self.subTest(value=value, padding=len(padding)):
+                self.assertEqual(extract.read_varint(data, 1, len(data)), (value, len(encoded)))
+        self.assertEqual(lengths, set(range(1, 10)))
+
+    def test_word_load(self):
+        # Enough bytes follow every varint for the 8-byte word load
+        self.check(b'\xff' * 9)
+
+    def test_near_end_of_data(self):
+        # Each varint ends the data, so offset + 9 runs past it
+        self.check(b'')
+
+    def test_full_64_bit_value(self):
+        for data in [b'\xff' * 9, b'\xff' * 9 + b'\x00']:
+            self.assertEqual(extract.read_varint(data, 0, len(data)), (0xFFFFFFFFFFFFFFFF, 9))
+
+    def test_offset_past_end(self):
+        with self.assertRaises(IndexError):
+            extract.read_varint(b'\x01', 1, 1)
+
+
+class ParseSerialTypeTest(unittest.TestCase):
+
+    def test_sign_extends_24_and_48_bit_integers(self):
+        for serial_type, size in [(3, 3), (5, 6)]:
+            bits = size * 8
+            for value in [0, -1, -2**(bits - 1), 2**(bits - 1) - 1]:
+                data = b'\xaa' + value.to_bytes(size, 'big', signed=True) + b'\xaa'
+                with self.subTest(serial_type=serial_type, value=value):
+                    self.assertEqual(extract.parse_serial_type(data, 1, serial_type), (value, size))
+
+
+class ParsePageTest(unittest.TestCase):
+
+    def test_truncated_page_without_cell_pointers(self):
+        # A leaf page header cut off before its cell pointer array
+        data = bytes(2048) + b'\x0d' + bytes(5)
+        self.assertEqual(list(extract.parse_page(data, 2048, 1024)), [])
+
+    def test_page_cut_off_inside_header(self):
+        # Leaf (8-byte header) and interior (12-byte header) pages cut off
+        # before their cell count or partway through the header
+        for page in [b'\x0d\x00\x00', b'\x0d' + bytes(6), b'\x05\x00\x00', b'\x05' + bytes(10)]:
+            with self.subTest(page=page):
+                data = bytes(2048) + page
+                self.assertEqual(list(extract.parse_page(data, 2048, 1024)), [])
+
+
+class DropDuplicatesTest(unittest.TestCase):
+
+    def test_keeps_rows_with_colliding_hashes(self):
+        records = [(1, row) for row in COLLIDING_ROWS]
+        self.assertEqual(list(extract.drop_duplicates(records)), COLLIDING_ROWS)
+
+    def test_keeps_text_and_blob_with_same_bytes(self):
+        records = [(1, (1, 'ab')), (1, (1, b'ab'))]
+        self.assertEqual(len(list(extract.drop_duplicates(records))), 2)
+
+    def test_keeps_same_values_under_different_rowids(self):
+        records = [(1, ('login', 'bob')), (2, ('login', 'bob')), (3, ('login', 'bob'))]
+        self.assertEqual(len(list(extract.drop_duplicates(records))), 3)
+
+    def test_drops_exact_and_padded_duplicates(self):
+        records = [(1, (1, 'a')), (1, (1, 'a')), (1, (1, 'a', None))]
+        self.assertEqual(list(extract.drop_duplicates(records)), [(1, 'a')])
+
+
+class SaveRowImagesTest(unittest.TestCase):
+
+    PNG = b'\x89PNG\r\n\x1a\n' + bytes(16)
+
+    def test_failed_write_keeps_blob(self):
+        real_write_image = extract.write_image
+        calls = []
+
+        def write_image(image_path, blob_data):
+            calls.append(image_path)
+            if len(calls) == 1:
+                raise OSError('disk full')
+            real_write_image(image_path, blob_data)
+
+        rows = [(1, self.PNG), (2, b'not an image'), (3, self.PNG)]
+        with mock.patch.object(extract, 'write_image', write_image), \
+                tempfile.TemporaryDirectory() as tmp:
+            out = list(extract.save_row_images(iter(rows), tmp))
+            files = os.listdir(tmp)
+        self.assertEqual(out, [[1, self.PNG], [2, b'not an image'], [3, 'image_1.png']])
+        self.assertEqual(files, ['image_1.png'])
+
+
+class RecoverLiveRecordsTest(unittest.TestCase):
+
+    def test_colliding_live_records_all_recovered(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'source.db')
+            output = os.path.join(tmp, 'recovered.db')
+            conn = sqlite3.connect(source)
+            conn.execute('CREATE TABLE t (a, b)')
+            conn.executemany('INSERT INTO t VALUES (?, ?)', COLLIDING_ROWS)
+            conn.commit()
+            conn.close()
+            subprocess.run([sys.executable, SCRIPT, '-i', source, '-o', output],
+                           check=True, stdout=subprocess.DEVNULL)
+            conn = sqlite3.connect(output)
+            rows = conn.execute(
+                'SELECT field1, field2 FROM recovered_data WHERE field1 IN (5, 7, 9)'
+            ).fetchall()
+            conn.close()
+        self.assertEqual(sorted(rows, key=repr), sorted(COLLIDING_ROWS, key=repr))
+        self.assertEqual(sum(type(b) is float for a, b in rows), 1)
+
+    def test_repeated_live_rows_all_recovered(self):
+        events = [('login', 'bob'), ('login', 'bob'), ('login', 'bob'), ('logout', 'bob')]
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'source.db')
+            output = os.path.join(tmp, 'recovered.db')
+            conn = sqlite3.connect(source)
+            conn.execute('CREATE TABLE events (action, user)')
+            conn.executemany('INSERT INTO events VALUES (?, ?)', events)
+            conn.commit()
+            conn.close()
+            subprocess.run([sys.executable, SCRIPT, '-i', source, '-o', output],
+                           check=True, stdout=subprocess.DEVNULL)
+            conn = sqlite3.connect(output)
+            rows = conn.execute(
+                "SELECT field1, field2 FROM recovered_data WHERE field2 = 'bob'"
+            ).fetchall()
+            conn.close()
+        self.assertEqual(sorted(rows), sorted(events))
+
+    def test_csv_output_pads_rows_and_keeps_nul(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'source.db')
+            output = os.path.join(tmp, 'recovered.csv')
+            conn = sqlite3.connect(source)
+            conn.execute('CREATE TABLE narrow (a)')
+            conn.execute('INSERT INTO narrow VALUES (?)', ('nul\x00inside',))
+            conn.execute('CREATE TABLE wide (a, b, c, d, e, f, g)')
+            conn.execute('INSERT INTO wide VALUES (1, 2, 3, 4, 5, 6, 7)')
+            conn.commit()
+            conn.close()
+            subprocess.run([sys.executable, SCRIPT, '-i', source, '-o', output, '-f', 'csv'],
+                           check=True, stdout=subprocess.DEVNULL)
+            with open(output, newline='', encoding='utf-8') as f:
+                rows = list(csv.reader(f))
+        self.assertEqual(rows[0], [f'field{i+1}' for i in range(7)])
+        self.assertIn(['nul\x00inside', '', '', '', '', '', ''], rows)
+        self.assertIn(['1', '2', '3', '4', '5', '6', '7'], rows)
+
+
+if __name__ == '__main__':
+    unittest.main()